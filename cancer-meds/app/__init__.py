@@ -4,11 +4,13 @@ from flask_login import LoginManager
 from flask_login import current_user
 from flask_mail import Mail
 from .config import Config
+from .caching import Cache
 import os
 
 db = SQLAlchemy()
 login_manager = LoginManager()
 mail = Mail()
+cache = Cache()
 
 def create_app():
     app = Flask(__name__, template_folder="templates", static_folder="static")
@@ -21,6 +23,7 @@ def create_app():
     login_manager.init_app(app)
     login_manager.login_view = "auth.login"
     mail.init_app(app)
+    cache.init_app(app)
 
     # Register blueprints or modules
     from app import models
@@ -38,7 +41,8 @@ def create_app():
         try:
             if getattr(current_user, 'is_authenticated', False) and getattr(current_user, 'role', None) == 'doctor':
                 from .models import Match
-                cnt = Match.query.filter_by(status='awaiting_verification').count()
+                from .caching import PENDING_VERIFICATIONS
+                cnt = cache.get_or_compute(PENDING_VERIFICATIONS, lambda: Match.query.filter_by(status='awaiting_verification').count(), ttl=30)
                 return dict(pending_verifications_count=cnt)
         except Exception:
             pass
@@ -48,8 +52,11 @@ def create_app():
     @app.route("/")
     def home():
         from .models import Medicine
-        # show some available donations
-        donations = Medicine.query.filter_by(type="donation", status="available").limit(8).all()
+        from .caching import HOME_DONATIONS
+        # show some available donations (plain dicts so they can be shared through the cache)
+        donations = cache.get_or_compute(HOME_DONATIONS, lambda: [
+            dict(id=m.id, name=m.name, quantity=m.quantity, expiry_date=m.expiry_date)
+            for m in Medicine.query.filter_by(type="donation", status="available").limit(8)], ttl=30)
         return __import__("flask").render_template("index.html", donations=donations)
 
     return app
\ No newline at end of file
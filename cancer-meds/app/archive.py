@@ -0,0 +1,150 @@
+"""Hot/cold archival of completed matches and closed listings.
+
+Completed matches and matched/cancelled medicines older than a cutoff are
+moved, with their images, into the archived_* tables in small batches so the
+live tables (and their indexes) only hold the working set. Archived rows keep
+their ids, which is why the live tables must use AUTOINCREMENT (see
+sql/autoincrement_ids.sql): otherwise SQLite hands the highest archived ids
+out again once those rows leave the live table. History views read through both stores with the helpers below;
+search, matching and rollups only ever look at the live tables.
+
+Run `flask archive_history` from cron (or any scheduler) to archive in the
+background; each batch is its own short transaction.
+"""
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, exists, insert, literal, or_, select, text
+from sqlalchemy.orm import joinedload
+
+from . import db
+from .models import (Image, Match, Medicine, ArchivedImage, ArchivedMatch,
+                     ArchivedMedicine)
+
+ARCHIVE_AFTER_DAYS = 90
+BATCH_SIZE = 500
+CLOSED_STATUSES = ("matched", "cancelled")
+
+
+def _check_autoincrement():
+    # refuse to archive into a database whose live tables can reuse ids
+    reusing = [t for t in ("medicine", "match", "image")
+               if "AUTOINCREMENT" not in (db.session.execute(
+                   text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :t"),
+                   {"t": t}).scalar() or "").upper()]
+    if reusing:
+        raise RuntimeError(f"Tables {', '.join(reusing)} can reuse archived ids; "
+                           "run sql/autoincrement_ids.sql before archiving.")
+
+
+def _move(live, cold, ids, now):
+    # INSERT ... SELECT into the archive table, then delete the live rows
+    if not ids:
+        return 0
+    cols = [c.name for c in cold.__table__.columns if c.name != "archived_at"]
+    src = live.__table__
+    sel = select(*[src.c[c] for c in cols], literal(now)).where(src.c.id.in_(ids))
+    db.session.execute(insert(cold.__table__).from_select(cols + ["archived_at"], sel))
+    db.session.execute(delete(src).where(src.c.id.in_(ids)))
+    return len(ids)
+
+
+def archive_batch(older_than_days=ARCHIVE_AFTER_DAYS, batch_size=BATCH_SIZE):
+    """Move one batch of old history to the archive tables and commit.
+
+    Returns a dict of moved row counts; all zeros means nothing is left.
+    """
+    now = datetime.utcnow()
+    cutoff = now - timedelta(days=older_than_days)
+
+    rows = (db.session.query(Match.id, Match.donor_medicine_id, Match.requester_medicine_id)
+            .filter(Match.status == "completed", Match.created_at < cutoff)
+            .order_by(Match.id).limit(batch_size).all())
+    match_ids = {r[0] for r in rows}
+    med_ids = {mid for r in rows for mid in r[1:]}
+    # a listing still referenced by a live match must stay with it
+    busy = set()
+    if med_ids:
+        for r in (db.session.query(Match.id, Match.donor_medicine_id, Match.requester_medicine_id)
+                  .filter(or_(Match.donor_medicine_id.in_(med_ids), Match.requester_medicine_id.in_(med_ids)),
+                          ~Match.id.in_(match_ids))):
+            busy.update(r[1:])
+    for mid, dmid, rmid in rows:
+        if dmid in busy or rmid in busy:
+            match_ids.discard(mid)
+    med_ids = {mid for r in rows if r[0] in match_ids for mid in r[1:]}
+
+    # closed listings that no live match points at
+    room = batch_size - len(med_ids)
+    if room > 0:
+        referenced = exists().where(or_(Match.donor_medicine_id == Medicine.id,
+                                        Match.requester_medicine_id == Medicine.id))
+        med_ids.update(mid for (mid,) in db.session.query(Medicine.id)
+                       .filter(Medicine.status.in_(CLOSED_STATUSES), Medicine.created_at < cutoff,
+                               ~referenced, ~Medicine.id.in_(med_ids))
+                       .order_by(Medicine.id).limit(room))
+
+    image_ids = [i for (i,) in db.session.query(Image.id).filter(Image.medicine_id.in_(med_ids))] if med_ids else []
+    moved = dict(matches=_move(Match, ArchivedMatch, sorted(match_ids), now),
+                 medicines=_move(Medicine, ArchivedMedicine, sorted(med_ids), now),
+                 images=_move(Image, ArchivedImage, image_ids, now))
+    db.session.commit()
+    return moved
+
+
+def run(older_than_days=ARCHIVE_AFTER_DAYS, batch_size=BATCH_SIZE, pause=0.1):
+    """Archive batches until nothing old is left, pausing between them."""
+    _check_autoincrement()
+    totals = dict(matches=0, medicines=0, images=0)
+    while True:
+        moved = archive_batch(older_than_days, batch_size)
+        for k, v in moved.items():
+            totals[k] += v
+        if not any(moved.values()):
+            return totals
+        time.sleep(pause)
+
+
+# Read-through helpers for history views
+
+def _eager(model):
+    return (joinedload(model.donor), joinedload(model.requester),
+            joinedload(model.donor_medicine), joinedload(model.requester_medicine))
+
+
+def matches_for(**filters):
+    """Live and archived matches matching `filters`, newest first."""
+    found = []
+    for model in (Match, ArchivedMatch):
+        found += model.query.options(*_eager(model)).filter_by(**filters).all()
+    return sorted(found, key=lambda m: m.created_at or datetime.min, reverse=True)
+
+
+def matches_for_medicines(medicine_ids):
+    """Live and archived matches involving any of `medicine_ids`, newest first."""
+    if not medicine_ids:
+        return []
+    found = []
+    for model in (Match, ArchivedMatch):
+        found += (model.query.options(*_eager(model))
+                  .filter(or_(model.donor_medicine_id.in_(medicine_ids),
+                              model.requester_medicine_id.in_(medicine_ids))).all())
+    return sorted(found, key=lambda m: m.created_at or datetime.min, reverse=True)
+
+
+def listings_for(**filters):
+    """Live listings followed by archived ones, for the owner's history pages."""
+    return (Medicine.query.filter_by(**filters).all()
+            + ArchivedMedicine.query.filter_by(**filters).order_by(ArchivedMedicine.created_at.desc()).all())
+
+
+def approved_image_medicine_ids(doctor_id):
+    ids = set()
+    for model in (Image, ArchivedImage):
+        ids.update(mid for (mid,) in db.session.query(model.medicine_id)
+                   .filter_by(approved=True, approved_by=doctor_id))
+    return ids
+
+
+def get_match(match_id):
+    return db.session.get(Match, match_id) or db.session.get(ArchivedMatch, match_id)
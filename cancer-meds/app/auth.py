@@ -1,6 +1,6 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from .models import User
-from . import db
+from . import db, summaries
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash
 from datetime import datetime
@@ -61,4 +61,23 @@ def login():
 def logout():
     logout_user()
     flash("Logged out", "info")
-    return redirect(url_for("home"))
\ No newline at end of file
+    return redirect(url_for("home"))
+
+
+@auth_bp.route("/donor_dashboard")
+@login_required
+def donor_dashboard():
+    if current_user.role != "donor":
+        flash("Unauthorized access", "danger")
+        return redirect(url_for("home"))
+    # everything on the dashboard comes from the per-user summary row
+    return render_template("donor_dashboard.html", user=current_user, summary=summaries.get(current_user.id))
+
+
+@auth_bp.route("/requester_dashboard")
+@login_required
+def requester_dashboard():
+    if current_user.role != "requester":
+        flash("Unauthorized access", "danger")
+        return redirect(url_for("home"))
+    return render_template("requester_dashboard.html", user=current_user, summary=summaries.get(current_user.id))
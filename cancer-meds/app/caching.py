@@ -0,0 +1,231 @@
+"""Shared cache for all worker processes on a host.
+
+A small SQLite file (separate from site.db) holds pickled values with an
+expiry time and a last-access time, so every worker process sees the same
+entries. Entries past their TTL are ignored and purged; when the cache grows
+past CACHE_MAX_ENTRIES the least recently used entries are evicted.
+
+`get_or_compute()` takes a per-key lease before computing, so when a popular
+entry expires only one worker (cluster-node-wide) recomputes it while the
+others wait briefly for the fresh value instead of all hitting the database.
+
+The cache is never allowed to break a request: an sqlite3 error (locked,
+missing or corrupt file) makes a read a miss and a write or delete a no-op,
+and is only logged. Deletes that fail leave the entry to expire by its TTL.
+
+Set CACHE_PATH to an empty value to disable caching (every call computes).
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+
+_MISS = object()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entry (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_cache_entry_accessed_at ON cache_entry(accessed_at);
+CREATE TABLE IF NOT EXISTS cache_lease (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class Cache:
+    # how often (in sets) to run eviction, and how stale an access time may get
+    EVICT_EVERY = 100
+    TOUCH_RESOLUTION = 1.0
+
+    def __init__(self, app=None):
+        self.path = None
+        self._local = threading.local()
+        self._sets = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.path = app.config.get("CACHE_PATH")
+        self.default_ttl = app.config.get("CACHE_DEFAULT_TTL", 60)
+        self.max_entries = app.config.get("CACHE_MAX_ENTRIES", 10000)
+        self.lease_ttl = app.config.get("CACHE_LEASE_TTL", 30)
+        # how long a waiter polls before computing itself; well below the lease TTL so
+        # a slow or dead lease holder costs the other requests at most this much
+        self.lease_wait = app.config.get("CACHE_LEASE_WAIT", 1.5)
+        self.prefix = app.config.get("CACHE_KEY_PREFIX", "")
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            try:
+                self._connect().close()
+            except sqlite3.Error as e:
+                print("Cache error (init):", e)
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # also recreates the tables if the cache file was removed
+        conn.executescript(_SCHEMA)
+        return conn
+
+    @property
+    def _conn(self):
+        # one connection per thread and process (never reuse one across a fork)
+        local = self._local
+        if getattr(local, "conn", None) is None or local.owner != (os.getpid(), self.path):
+            local.conn = self._connect()
+            local.owner = (os.getpid(), self.path)
+        return local.conn
+
+    def _failed(self, op, e):
+        print(f"Cache error ({op}):", e)
+        # reconnect on the next call in case the connection itself went bad
+        conn, self._local.conn = getattr(self._local, "conn", None), None
+        if conn is not None:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def get(self, key, default=None):
+        if not self.enabled:
+            return default
+        key = self.prefix + key
+        now = time.time()
+        try:
+            row = self._conn.execute(
+                "SELECT value, accessed_at FROM cache_entry WHERE key = ? AND expires_at > ?",
+                (key, now)).fetchone()
+            if row is None:
+                return default
+            if now - row[1] > self.TOUCH_RESOLUTION:
+                self._conn.execute("UPDATE cache_entry SET accessed_at = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            self._failed("get", e)
+            return default
+        return pickle.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        if not self.enabled:
+            return
+        now = time.time()
+        ttl = self.default_ttl if ttl is None else ttl
+        try:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_entry (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (self.prefix + key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), now + ttl, now))
+        except sqlite3.Error as e:
+            self._failed("set", e)
+            return
+        self._sets += 1
+        if self._sets % self.EVICT_EVERY == 0:
+            self.evict()
+
+    def delete(self, *keys):
+        if not self.enabled or not keys:
+            return
+        try:
+            self._conn.executemany("DELETE FROM cache_entry WHERE key = ?", [(self.prefix + k,) for k in keys])
+        except sqlite3.Error as e:
+            self._failed("delete", e)
+
+    def clear(self):
+        if not self.enabled:
+            return
+        try:
+            self._conn.executescript("DELETE FROM cache_entry; DELETE FROM cache_lease;")
+        except sqlite3.Error as e:
+            self._failed("clear", e)
+
+    def evict(self):
+        """Drop expired entries, then the least recently used ones over the limit."""
+        now = time.time()
+        try:
+            conn = self._conn
+            conn.execute("DELETE FROM cache_entry WHERE expires_at <= ?", (now,))
+            conn.execute("DELETE FROM cache_lease WHERE expires_at <= ?", (now,))
+            conn.execute(
+                "DELETE FROM cache_entry WHERE key IN ("
+                " SELECT key FROM cache_entry ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,))
+        except sqlite3.Error as e:
+            self._failed("evict", e)
+
+    def _acquire(self, key, owner):
+        # take the lease if it is free or its previous owner's lease ran out;
+        # None means the cache failed and the caller should just compute
+        now = time.time()
+        try:
+            cur = self._conn.execute(
+                "INSERT INTO cache_lease (key, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE cache_lease.expires_at <= ?",
+                (key, owner, now + self.lease_ttl, now))
+        except sqlite3.Error as e:
+            self._failed("lease", e)
+            return None
+        return cur.rowcount == 1
+
+    def _release(self, key, owner):
+        try:
+            self._conn.execute("DELETE FROM cache_lease WHERE key = ? AND owner = ?", (key, owner))
+        except sqlite3.Error as e:
+            self._failed("release", e)
+
+    def get_or_compute(self, key, compute, ttl=None, wait=None):
+        """Return the cached value for `key`, computing and storing it on a miss.
+
+        Only the worker holding the key's lease runs `compute`; the others
+        poll for its result for up to `wait` seconds (default:
+        CACHE_LEASE_WAIT, 1.5 s) and compute themselves if it doesn't show up.
+        """
+        if not self.enabled:
+            return compute()
+        value = self.get(key, _MISS)
+        if value is not _MISS:
+            return value
+        lease_key, owner = self.prefix + key, uuid.uuid4().hex
+        deadline = time.time() + (self.lease_wait if wait is None else wait)
+        delay = 0.01
+        while True:
+            acquired = self._acquire(lease_key, owner)
+            if acquired:
+                break
+            if acquired is None or time.time() >= deadline:
+                return compute()
+            time.sleep(delay)
+            delay = min(delay * 2, 0.2)
+            value = self.get(key, _MISS)
+            if value is not _MISS:
+                return value
+        try:
+            # another worker may have finished between our miss and the lease
+            value = self.get(key, _MISS)
+            if value is _MISS:
+                value = compute()
+                self.set(key, value, ttl)
+            return value
+        finally:
+            self._release(lease_key, owner)
+
+
+# keys shared between the views that fill and invalidate them
+HOME_DONATIONS = "home:donations"
+PENDING_VERIFICATIONS = "matches:pending_verifications_count"
+SUPPLY_ROWS = "meds:supply_rows"
+
+
+def search_key(name_key):
+    return "matches:search:" + name_key
@@ -6,7 +6,8 @@ class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret-key")
     # SQLite default for dev:
     basedir = os.path.abspath(os.path.dirname(__file__))
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.abspath(os.path.join(basedir, '..', 'site.db'))
+    SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL") or \
+        'sqlite:///' + os.path.abspath(os.path.join(basedir, '..', 'site.db'))
 
     #SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL") or \
     #"sqlite:///" + os.path.join(basedir, "..", "site.db")
@@ -14,6 +15,11 @@ class Config:
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Shared cache (SQLite file used by every worker on this host); empty path disables it
+    CACHE_PATH = os.environ.get("CACHE_PATH", os.path.abspath(os.path.join(basedir, '..', 'cache.db')))
+    CACHE_DEFAULT_TTL = int(os.environ.get("CACHE_DEFAULT_TTL", 60))
+    CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", 10000))
+
     # Mail: configure for production (SendGrid/SES) via env vars
     MAIL_SERVER = os.environ.get("MAIL_SERVER", "localhost")
     MAIL_PORT = int(os.environ.get("MAIL_PORT", 25))
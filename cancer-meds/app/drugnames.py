@@ -0,0 +1,116 @@
+"""Canonical drug-name normalization.
+
+Free-text medicine names ("Imatinib 400mg", "imatinib mesylate", "Gleevec")
+are reduced to a canonical match key ("imatinib") that is stored on
+`Medicine.name_key` at write time, so matching is an indexed equality lookup.
+
+The synonym dictionary lives in data/drug_synonyms.csv: each row maps an
+alias (brand, alternate spelling, multi-word name) to its generic name, or
+to nothing for tokens that should be dropped (salts, units, dosage forms,
+pharmacopoeia and pack words). Aliases, plus every generic as an alias of
+itself, are loaded into a token trie so multi-word names ("5 fu",
+"zoledronic acid") are matched longest-first.
+
+Label text is full of words the dictionary doesn't know ("Tab Gefitinib
+250 mg (Geftinat)"), so unknown words never add a component of their own
+when a recognised generic is present: they only count as the drug name
+when nothing else is recognised. Combinations are built from recognised
+generics, or across explicit separators (+ / , &).
+"""
+import csv
+import os
+import re
+from functools import lru_cache
+
+SYNONYMS_PATH = os.path.join(os.path.dirname(__file__), 'data', 'drug_synonyms.csv')
+
+_TOKEN_RE = re.compile(r'[a-z]+|\d+(?:\.\d+)?|[+/,&]')
+_END = ''  # trie key holding the generic name ('' = drop) for a complete alias
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall((text or '').lower())
+
+
+@lru_cache(maxsize=1)
+def load_index(path=SYNONYMS_PATH):
+    """Build the alias trie: nested dicts of tokens, `_END` marks a full alias."""
+    trie = {}
+    with open(path, newline='', encoding='utf-8') as fh:
+        for row in csv.reader(fh):
+            if not row or row[0].startswith('#') or row[0] == 'alias':
+                continue
+            tokens = tokenize(row[0])
+            if not tokens:
+                continue
+            generic = ' '.join(tokenize(row[1])) if len(row) > 1 else ''
+            _insert(trie, tokens, generic)
+            if generic:
+                # the generic name itself is recognised too
+                node = trie
+                for tok in generic.split():
+                    node = node.setdefault(tok, {})
+                node.setdefault(_END, generic)
+    return trie
+
+
+def _insert(trie, tokens, generic):
+    node = trie
+    for tok in tokens:
+        node = node.setdefault(tok, {})
+    node[_END] = generic
+
+
+def _longest_alias(tokens, start, trie):
+    # returns (generic, length) of the longest alias starting at `start`
+    node, best = trie, None
+    for i in range(start, len(tokens)):
+        node = node.get(tokens[i])
+        if node is None:
+            break
+        if _END in node:
+            best = (node[_END], i - start + 1)
+    return best
+
+
+def _segment_name(known, unknown):
+    # recognised generics win; unknown words only name an otherwise unknown drug
+    if known:
+        return known
+    return [' '.join(unknown)] if unknown else []
+
+
+@lru_cache(maxsize=4096)
+def normalize(name):
+    """Return the canonical match key for a medicine name.
+
+    Aliases are mapped to their generic and salts/units/forms, pack words
+    and bare strengths are dropped. Within each part between separators the
+    recognised generics are kept (unknown words are only used when none
+    are recognised); the parts are then de-duplicated and sorted
+    (combinations join with '+'). Returns '' for an empty name.
+    """
+    trie = load_index()
+    tokens = tokenize(name)
+    parts = []
+    known, unknown = [], []
+    i = 0
+    while i < len(tokens):
+        hit = _longest_alias(tokens, i, trie)
+        if hit:
+            generic, length = hit
+            i += length
+            if generic:
+                known.append(generic)
+            continue
+        tok = tokens[i]
+        i += 1
+        if tok in '+/,&':
+            # explicit separator: the next part is another drug of a combination
+            parts += _segment_name(known, unknown)
+            known, unknown = [], []
+        elif not tok[0].isdigit():
+            # strengths and pack counts are dropped
+            unknown.append(tok)
+    parts += _segment_name(known, unknown)
+    return '+'.join(sorted(set(parts)))
@@ -0,0 +1,59 @@
+"""Live match status updates for the My Matches page, by short polling.
+
+Views record a `MatchEvent` row for the donor and the requester in the same
+transaction as the status change (like `summaries.refresh()`), so the feed
+lives in site.db and every worker process sees every event. The page polls
+/matches/events every POLL_INTERVAL_SECONDS with the id of the last event it
+has seen; the endpoint answers at once from the (user_id, id) index and
+never holds a worker thread open, so idle tabs cost one cheap request per
+interval instead of a thread each.
+
+Events older than EVENT_TTL_SECONDS are pruned when new ones are written. A
+client whose cursor is older than the oldest kept event, or that is more
+than MAX_EVENTS behind, is told to resync (reload the page).
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from . import db
+from .models import MatchEvent
+
+POLL_INTERVAL_SECONDS = 10
+EVENT_TTL_SECONDS = 3600
+MAX_EVENTS = 100
+
+
+def publish_match(match):
+    """Record a match's current status for its donor and requester (call before commit)."""
+    if match.id is None:
+        db.session.flush()
+    now = datetime.utcnow()
+    db.session.add_all([MatchEvent(user_id=uid, match_id=match.id, status=match.status, created_at=now)
+                        for uid in {match.donor_id, match.requester_id}])
+    db.session.query(MatchEvent).filter(
+        MatchEvent.created_at < now - timedelta(seconds=EVENT_TTL_SECONDS)).delete(synchronize_session=False)
+
+
+def cursor():
+    """Id of the newest event, the starting point for a freshly rendered page."""
+    return db.session.query(func.max(MatchEvent.id)).scalar() or 0
+
+
+def since(user_id, after):
+    """Events for `user_id` newer than `after`, as a JSON-ready dict.
+
+    `last_id` is the cursor the client should send next time; `resync` is
+    set when events it has not seen may already have been pruned.
+    """
+    last_id, oldest = db.session.query(func.max(MatchEvent.id), func.min(MatchEvent.id)).one()
+    last_id = last_id or 0
+    if after > last_id or (oldest is not None and after < oldest - 1):
+        return dict(last_id=last_id, events=[], resync=True)
+    rows = (MatchEvent.query.filter(MatchEvent.user_id == user_id, MatchEvent.id > after,
+                                    MatchEvent.id <= last_id)
+            .order_by(MatchEvent.id).limit(MAX_EVENTS + 1).all())
+    if len(rows) > MAX_EVENTS:
+        return dict(last_id=last_id, events=[], resync=True)
+    return dict(last_id=last_id, resync=False,
+                events=[dict(id=e.id, match_id=e.match_id, status=e.status) for e in rows])
@@ -1,10 +1,12 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app as app
+from flask import Blueprint, render_template, redirect, url_for, flash, request, abort, jsonify, current_app as app
 from flask_login import login_required, current_user
 from .models import Medicine, Match, User
 from datetime import datetime
-from . import db, mail
+from . import db, mail, cache, rollups, drugnames, events, archive, summaries
+from .caching import HOME_DONATIONS, PENDING_VERIFICATIONS, search_key
 from flask_mail import Message
 import math
+import numpy as np
 
 matches_bp = Blueprint("matches", __name__, url_prefix="/matches", template_folder="templates")
 
@@ -19,38 +21,91 @@ def send_notification(to, subject, body):
     except Exception as e:
         print("Error sending mail:", e)
 
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km between arrays of coordinates.
+
+    Works element-wise on numpy arrays; pairs with a missing coordinate
+    (NaN) come back as NaN.
+    """
+    R = 6371.0
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = np.radians(lon2 - lon1)
+    a = np.sin(dphi/2)**2 + np.cos(phi1)*np.cos(phi2)*np.sin(dlambda/2)**2
+    return R * 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
+
+
+def match_geo_payload(matches):
+    """Build the compact coordinate/distance payload for completed matches.
+
+    Returns a dict keyed by match id (as str, for JSON) holding donor and
+    requester coordinates and the distance between them. Distances are
+    computed in one vectorized pass over all matches.
+    """
+    completed = [m for m in matches if m.status == 'completed']
+    if not completed:
+        return {}
+    coords = np.array([[m.donor.latitude, m.donor.longitude,
+                        m.requester.latitude, m.requester.longitude] for m in completed],
+                      dtype=float)
+    dist = haversine_km(coords[:, 0], coords[:, 1], coords[:, 2], coords[:, 3])
+    payload = {}
+    for m, row, d in zip(completed, coords.tolist(), dist.tolist()):
+        payload[str(m.id)] = {
+            'donor': None if math.isnan(row[0]) or math.isnan(row[1]) else row[0:2],
+            'requester': None if math.isnan(row[2]) or math.isnan(row[3]) else row[2:4],
+            'distance_km': None if math.isnan(d) else round(d, 1),
+        }
+    return payload
+
+
 @matches_bp.route("/my_matches")
 @login_required
 def my_matches():
     matches = []
+    # live and archived matches, users and medicines eager-loaded
     if current_user.role == "donor":
-        matches = Match.query.filter_by(donor_id=current_user.id).order_by(Match.created_at.desc()).all()
+        matches = archive.matches_for(donor_id=current_user.id)
     elif current_user.role == "requester":
-        matches = Match.query.filter_by(requester_id=current_user.id).order_by(Match.created_at.desc()).all()
-    # compute distance (km) for each match if coordinates are available
-    def haversine_km(lat1, lon1, lat2, lon2):
-        if None in (lat1, lon1, lat2, lon2):
-            return None
-        R = 6371.0
-        phi1, phi2 = math.radians(lat1), math.radians(lat2)
-        dphi = math.radians(lat2 - lat1)
-        dlambda = math.radians(lon2 - lon1)
-        a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dlambda/2)**2
-        return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-
-    for m in matches:
-        try:
-            # use user coordinates (donor/requester) rather than per-medicine coordinates
-            dlat = getattr(m.donor, 'latitude', None)
-            dlon = getattr(m.donor, 'longitude', None)
-            rlat = getattr(m.requester, 'latitude', None)
-            rlon = getattr(m.requester, 'longitude', None)
-            dist = haversine_km(dlat, dlon, rlat, rlon)
-            m.distance_km = round(dist, 1) if dist is not None else None
-        except Exception:
-            m.distance_km = None
+        matches = archive.matches_for(requester_id=current_user.id)
+    # use user coordinates (donor/requester) rather than per-medicine coordinates
+    geo = match_geo_payload(matches)
+    return render_template("matches/my_matches.html", matches=matches, geo=geo,
+                           events_after=events.cursor(), poll_seconds=events.POLL_INTERVAL_SECONDS)
+
 
-    return render_template("matches/my_matches.html", matches=matches)
+@matches_bp.route("/contact/<int:match_id>")
+@login_required
+def match_contact(match_id):
+    # modal body for a completed match, fetched when the contact modal opens
+    match = archive.get_match(match_id)
+    if match is None:
+        abort(404)
+    if current_user.id not in (match.donor_id, match.requester_id):
+        abort(403)
+    if match.status != 'completed':
+        abort(404)
+    geo = match_geo_payload([match]).get(str(match.id), {})
+    return render_template("matches/_contact.html", match=match, geo=geo)
+
+
+@matches_bp.route("/row/<int:match_id>")
+@login_required
+def match_row(match_id):
+    # single table row, re-fetched by my_matches when a status event arrives
+    match = Match.query.get_or_404(match_id)
+    if current_user.id not in (match.donor_id, match.requester_id):
+        abort(403)
+    return render_template("matches/_match_row.html", m=match)
+
+
+@matches_bp.route("/events")
+@login_required
+def match_events():
+    # polled by my_matches: status changes after the client's cursor, answered at once
+    resp = jsonify(events.since(current_user.id, request.args.get("after", 0, type=int)))
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
 
 
 @matches_bp.route('/pending_verifications')
@@ -61,29 +116,23 @@ def pending_verifications():
     # show matches that are awaiting verification
     pending = Match.query.filter_by(status='awaiting_verification').order_by(Match.created_at.desc()).all()
 
-    # also show matches/images this doctor has already approved
-    from .models import Image
-    approved_imgs = Image.query.filter_by(approved=True, approved_by=current_user.id).all()
-    approved_matches_set = set()
-    for img in approved_imgs:
-        # find matches where this image's medicine is either donor or requester medicine
-        m = Match.query.filter((Match.donor_medicine_id == img.medicine_id) | (Match.requester_medicine_id == img.medicine_id)).first()
-        if m:
-            approved_matches_set.add(m)
-    approved = sorted(list(approved_matches_set), key=lambda x: x.created_at, reverse=True)
+    # also show matches (live or archived) whose images this doctor has approved
+    approved = archive.matches_for_medicines(archive.approved_image_medicine_ids(current_user.id))
 
     return render_template('matches/pending_verifications.html', pending=pending, approved=approved)
 
 @matches_bp.route("/find")
 @login_required
 def find_matches():
-    # Very simple matching UI: requester searches donations by name
+    # Very simple matching UI: requester searches donations by canonical drug name
     query = request.args.get("q", "")
     donations = []
-    if query:
-        donations = Medicine.query.filter(Medicine.type=="donation",
-                                          Medicine.status=="available",
-                                          Medicine.name.ilike(f"%{query}%")).all()
+    key = drugnames.normalize(query)
+    if key:
+        # shared across workers; plain dicts so they can be pickled
+        donations = cache.get_or_compute(search_key(key), lambda: [
+            dict(id=d.id, name=d.name, quantity=d.quantity, expiry_date=d.expiry_date)
+            for d in Medicine.query.filter_by(name_key=key, type="donation", status="available")], ttl=30)
     # If requester, provide their available requests for matching
     requests = []
     if current_user.is_authenticated and getattr(current_user, 'role', None) == 'requester':
@@ -114,9 +163,16 @@ def request_match(donor_mid, request_mid):
                   status="pending")
     db.session.add(match)
     # mark as pending to prevent other matches
+    donor_before, req_before = rollups.snapshot(donor_med), rollups.snapshot(req_med)
     donor_med.status = "pending"
     req_med.status = "pending"
+    rollups.listing_changed(donor_before, donor_med)
+    rollups.listing_changed(req_before, req_med)
+    rollups.match_created(match, req_med)
+    summaries.refresh(match.donor_id, match.requester_id)
+    events.publish_match(match)
     db.session.commit()
+    cache.delete(HOME_DONATIONS, search_key(donor_med.name_key or ""))
 
     # notify donor
     donor_user = User.query.get(donor_med.user_id)
@@ -134,6 +190,8 @@ def donor_accept(match_id):
     if match.donor_id != current_user.id:
         flash("Unauthorized", "danger"); return redirect(url_for("home"))
     match.status = "donor_accepted"
+    summaries.refresh(match.donor_id, match.requester_id)
+    events.publish_match(match)
     db.session.commit()
     # notify requester
     requester = User.query.get(match.requester_id)
@@ -152,7 +210,10 @@ def requester_confirm(match_id):
         flash("Match not ready", "warning"); return redirect(url_for("meds.my_requests"))
     # move to awaiting verification by doctors
     match.status = 'awaiting_verification'
+    summaries.refresh(match.donor_id, match.requester_id)
+    events.publish_match(match)
     db.session.commit()
+    cache.delete(PENDING_VERIFICATIONS)
     # notify doctors to review this match
     doctors = User.query.filter_by(role='doctor').all()
     for d in doctors:
@@ -169,8 +230,12 @@ def requester_confirm(match_id):
 def verify(match_id):
     if current_user.role != 'doctor':
         flash('Unauthorized', 'danger'); return redirect(url_for('home'))
-    match = Match.query.get_or_404(match_id)
+    match = archive.get_match(match_id)
+    if match is None:
+        abort(404)
     if request.method == 'POST':
+        if match.archived:
+            flash('Match is archived and cannot be changed', 'warning'); return redirect(url_for('matches.pending_verifications'))
         # approve images for both medicines
         from .models import Image
         imgs = Image.query.filter(Image.medicine_id.in_([match.donor_medicine_id, match.requester_medicine_id])).all()
@@ -182,8 +247,14 @@ def verify(match_id):
         # finalize match and reveal contacts
         match.status = 'completed'
         dm = match.donor_medicine; rm = match.requester_medicine
+        dm_before, rm_before = rollups.snapshot(dm), rollups.snapshot(rm)
         dm.status = 'matched'; rm.status = 'matched'
+        rollups.listing_changed(dm_before, dm)
+        rollups.listing_changed(rm_before, rm)
+        summaries.refresh(match.donor_id, match.requester_id)
+        events.publish_match(match)
         db.session.commit()
+        cache.delete(PENDING_VERIFICATIONS)
         donor = User.query.get(match.donor_id)
         requester = User.query.get(match.requester_id)
         body = f"Match completed after doctor verification. Donor: {donor.name}, Email: {donor.email}, Phone: {donor.phone}\nRequester: {requester.name}, Email: {requester.email}, Phone: {requester.phone}"
@@ -1,7 +1,8 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app as app
+from flask import Blueprint, render_template, redirect, url_for, flash, request, after_this_request, current_app as app
 from flask_login import login_required, current_user
 from .models import Medicine, User, Match
-from . import db
+from . import db, cache, rollups, drugnames, archive, summaries
+from .caching import HOME_DONATIONS, SUPPLY_ROWS, search_key
 from datetime import datetime
 from . import mail
 from flask_mail import Message
@@ -70,11 +71,63 @@ def send_notification(to, subject, body):
     except Exception as e:
         print("Error sending mail:", e)
 
+def _send_batch(flask_app, notes):
+    # one SMTP connection for the whole batch; runs after the response went out
+    with flask_app.app_context():
+        if not flask_app.config.get("MAIL_SERVER"):
+            for to, subject, body in notes:
+                print("MAIL not configured. Notification to:", to, subject, body)
+            return
+        try:
+            with mail.connect() as conn:
+                for to, subject, body in notes:
+                    try:
+                        conn.send(Message(subject=subject, recipients=[to], body=body))
+                    except Exception as e:
+                        print("Error sending mail:", e)
+        except Exception as e:
+            print("Error sending mail:", e)
+
+def send_notifications_after_response(notes):
+    """Send (to, subject, body) notifications once the current response is sent."""
+    if not notes:
+        return
+    flask_app = app._get_current_object()
+
+    @after_this_request
+    def _defer(response):
+        response.call_on_close(lambda: _send_batch(flask_app, notes))
+        return response
+
+def notify_standing_requests(donation):
+    """Tell requesters with an open request for this medicine that a donation appeared.
+
+    Open requests act as standing subscriptions: the lookup is one range scan
+    of the (name_key, type, status, region) index over the donation's region
+    and requests without one (a donation without a region reaches every
+    region). Each requester gets one notification, sent in a single batch
+    after the donor's response.
+    """
+    if not donation.name_key:
+        return 0
+    q = (db.session.query(User.email).join(Medicine, Medicine.user_id == User.id)
+         .filter(Medicine.name_key == donation.name_key, Medicine.type == "request",
+                 Medicine.status == "available", Medicine.user_id != donation.user_id))
+    if donation.region:
+        q = q.filter(Medicine.region.in_((donation.region, "")))
+    emails = sorted({email for (email,) in q.distinct()})
+    link = url_for("matches.find_matches", q=donation.name, _external=True)
+    send_notifications_after_response([
+        (email, "A donation matching your request is available",
+         f"A donation of {donation.name} (Qty: {donation.quantity}) was just listed. "
+         f"Request a match here: {link}") for email in emails])
+    return len(emails)
+
 @meds_bp.route("/my_donations")
 @login_required
 def my_donations():
-    donations = Medicine.query.filter_by(user_id=current_user.id, type="donation").all()
-    return render_template("donor/donations.html", donations=donations)
+    donations = archive.listings_for(user_id=current_user.id, type="donation")
+    return render_template("donor/donations.html", donations=donations, summary=summaries.get(current_user.id))
 
 @meds_bp.route("/add_donation", methods=["GET","POST"])
 @login_required
@@ -87,15 +140,21 @@ def add_donation():
         location = request.form.get('location')
         # store donation; user coordinates are stored on the User model instead of per-medicine
         m = Medicine(user_id=current_user.id, name=form.name.data,
+                     name_key=drugnames.normalize(form.name.data),
                      quantity=form.quantity.data, expiry_date=form.expiry_date.data,
-                     type="donation", status="available", location=location)
+                     type="donation", status="available", location=location,
+                     region=rollups.region_key(location))
         db.session.add(m)
+        rollups.listing_added(m)
+        summaries.refresh(m.user_id)
         db.session.commit()
         # handle uploaded images
         files = request.files.getlist('images')
         if files:
             save_uploads(files, m.id, current_user.id, 'donation_photo')
             db.session.commit()
+        cache.delete(HOME_DONATIONS, search_key(m.name_key))
+        notify_standing_requests(m)
         flash("Donation added", "success")
         return redirect(url_for("meds.my_donations"))
     return render_template("donor/add_medicine.html", form=form)
@@ -110,10 +169,14 @@ def edit_donation(mid):
         flash("Cannot edit matched item", "warning"); return redirect(url_for("meds.my_donations"))
     form = MedicineForm(obj=m)
     if form.validate_on_submit():
+        before = rollups.snapshot(m)
         m.name = form.name.data
+        m.name_key = drugnames.normalize(form.name.data)
         m.quantity = form.quantity.data
         m.expiry_date = form.expiry_date.data
+        rollups.listing_changed(before, m)
         db.session.commit()
+        cache.delete(HOME_DONATIONS, search_key(before.name_key or ""), search_key(m.name_key))
         flash("Updated", "success")
         return redirect(url_for("meds.my_donations"))
     return render_template("donor/edit_medicine.html", form=form, med=m)
@@ -126,7 +189,11 @@ def delete_donation(mid):
         flash("Unauthorized", "danger"); return redirect(url_for("home"))
     if m.status == "matched":
         flash("Cannot delete matched item", "warning"); return redirect(url_for("meds.my_donations"))
-    db.session.delete(m); db.session.commit()
+    rollups.listing_removed(m)
+    db.session.delete(m)
+    summaries.refresh(m.user_id)
+    db.session.commit()
+    cache.delete(HOME_DONATIONS, search_key(m.name_key or ""))
     flash("Deleted", "info")
     return redirect(url_for("meds.my_donations"))
 
@@ -134,8 +201,8 @@ def delete_donation(mid):
 @meds_bp.route("/my_requests")
 @login_required
 def my_requests():
-    reqs = Medicine.query.filter_by(user_id=current_user.id, type="request").all()
-    return render_template("requester/requests.html", requests=reqs)
+    reqs = archive.listings_for(user_id=current_user.id, type="request")
+    return render_template("requester/requests.html", requests=reqs, summary=summaries.get(current_user.id))
 
 @meds_bp.route("/add_medicine", methods=["GET","POST"])
 @login_required
@@ -148,9 +215,13 @@ def add_medicine():
         location = request.form.get('location')
         # store request; user coordinates are stored on the User model instead of per-medicine
         m = Medicine(user_id=current_user.id, name=form.name.data,
+                     name_key=drugnames.normalize(form.name.data),
                      quantity=form.quantity.data, expiry_date=form.expiry_date.data,
-                     type="request", status="available", location=location)
+                     type="request", status="available", location=location,
+                     region=rollups.region_key(location))
         db.session.add(m)
+        rollups.listing_added(m)
+        summaries.refresh(m.user_id)
         db.session.commit()
         # handle prescription uploads
         files = request.files.getlist('prescriptions')
@@ -171,9 +242,12 @@ def edit_request(mid):
         flash("Cannot edit matched item", "warning"); return redirect(url_for("meds.my_requests"))
     form = MedicineForm(obj=m)
     if form.validate_on_submit():
+        before = rollups.snapshot(m)
         m.name = form.name.data
+        m.name_key = drugnames.normalize(form.name.data)
         m.quantity = form.quantity.data
         m.expiry_date = form.expiry_date.data
+        rollups.listing_changed(before, m)
         db.session.commit()
         flash("Updated", "success")
         return redirect(url_for("meds.my_requests"))
@@ -187,7 +261,10 @@ def delete_request(mid):
         flash("Unauthorized", "danger"); return redirect(url_for("home"))
     if m.status == "matched":
         flash("Cannot delete matched item", "warning"); return redirect(url_for("meds.my_requests"))
-    db.session.delete(m); db.session.commit()
+    rollups.listing_removed(m)
+    db.session.delete(m)
+    summaries.refresh(m.user_id)
+    db.session.commit()
     flash("Deleted", "info")
     return redirect(url_for("meds.my_requests"))
 
@@ -224,4 +301,14 @@ def profile():
         form.latitude.data = getattr(current_user, 'latitude', '') or ''
         form.longitude.data = getattr(current_user, 'longitude', '') or ''
 
-    return render_template('profile.html', form=form)
\ No newline at end of file
+    return render_template('profile.html', form=form)
+
+
+# Supply/demand overview backed by the incrementally maintained rollups
+@meds_bp.route('/supply')
+@login_required
+def supply_dashboard():
+    if current_user.role != 'doctor':
+        flash('Unauthorized', 'danger'); return redirect(url_for('home'))
+    rows = cache.get_or_compute(SUPPLY_ROWS, rollups.dashboard, ttl=60)
+    return render_template('supply_dashboard.html', rows=rows, soon_days=rollups.EXPIRING_SOON_DAYS)
@@ -31,7 +31,7 @@ def load_user(user_id):
 
 class Medicine(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     name = db.Column(db.String(200), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
     expiry_date = db.Column(db.Date, nullable=True)
@@ -42,6 +42,16 @@ class Medicine(db.Model):
     proof = db.Column(db.String(300), nullable=True)
     # free-form location (address or GPS string)
     location = db.Column(db.String(300), nullable=True)
+    # canonical drug name (see app.drugnames), used for indexed matching
+    name_key = db.Column(db.String(200), nullable=True)
+    # normalized region of `location` (rollups.region_key), '' when unknown
+    region = db.Column(db.String(300), nullable=True, default="")
+
+    # AUTOINCREMENT: archived rows keep their ids, so ids must never be reused
+    __table_args__ = (db.Index('ix_medicine_match_key', 'name_key', 'type', 'status', 'region'),
+                      {'sqlite_autoincrement': True})
+
+    archived = False
 
 
 
@@ -59,17 +69,139 @@ class Image(db.Model):
     # relationships
     uploader = db.relationship('User', foreign_keys=[uploader_id], backref='uploaded_images')
 
+    __table_args__ = {'sqlite_autoincrement': True}
+
 # add reverse relationship on Medicine
 Medicine.images = db.relationship('Image', backref='medicine', lazy=True)
 
 class Match(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    donor_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    requester_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    donor_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    requester_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     donor_medicine_id = db.Column(db.Integer, db.ForeignKey('medicine.id'), nullable=False)
     requester_medicine_id = db.Column(db.Integer, db.ForeignKey('medicine.id'), nullable=False)
     status = db.Column(db.String(20), default="pending")  # pending, donor_accepted, requester_confirmed, completed
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     donor_medicine = db.relationship("Medicine", foreign_keys=[donor_medicine_id], uselist=False, post_update=True)
-    requester_medicine = db.relationship("Medicine", foreign_keys=[requester_medicine_id], uselist=False, post_update=True)
\ No newline at end of file
+    requester_medicine = db.relationship("Medicine", foreign_keys=[requester_medicine_id], uselist=False, post_update=True)
+
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    archived = False
+
+
+# Cold storage for completed matches and closed listings, filled by app.archive.
+# Rows keep their original ids so links and history views keep working; the
+# live tables use AUTOINCREMENT so an archived id is never handed out again.
+class ArchivedMedicine(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    name = db.Column(db.String(200), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    expiry_date = db.Column(db.Date, nullable=True)
+    type = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20))
+    created_at = db.Column(db.DateTime)
+    proof = db.Column(db.String(300), nullable=True)
+    location = db.Column(db.String(300), nullable=True)
+    name_key = db.Column(db.String(200), nullable=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    owner = db.relationship('User', foreign_keys=[user_id])
+    images = db.relationship('ArchivedImage', backref='medicine', lazy=True)
+
+    archived = True
+
+
+class ArchivedImage(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String(300), nullable=False)
+    medicine_id = db.Column(db.Integer, db.ForeignKey('archived_medicine.id'), nullable=False, index=True)
+    uploader_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    image_type = db.Column(db.String(50), nullable=False)
+    approved = db.Column(db.Boolean, default=False)
+    approved_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True, index=True)
+    approved_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    uploader = db.relationship('User', foreign_keys=[uploader_id])
+
+
+class ArchivedMatch(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    donor_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    requester_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    donor_medicine_id = db.Column(db.Integer, db.ForeignKey('archived_medicine.id'), nullable=False, index=True)
+    requester_medicine_id = db.Column(db.Integer, db.ForeignKey('archived_medicine.id'), nullable=False, index=True)
+    status = db.Column(db.String(20))
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    donor = db.relationship('User', foreign_keys=[donor_id])
+    requester = db.relationship('User', foreign_keys=[requester_id])
+    donor_medicine = db.relationship('ArchivedMedicine', foreign_keys=[donor_medicine_id], uselist=False)
+    requester_medicine = db.relationship('ArchivedMedicine', foreign_keys=[requester_medicine_id], uselist=False)
+
+    archived = True
+
+# Supply/demand rollups, maintained incrementally by app.rollups
+class MedicineRollup(db.Model):
+    name_key = db.Column(db.String(200), primary_key=True)
+    region = db.Column(db.String(120), primary_key=True, default="")
+    open_requests = db.Column(db.Integer, nullable=False, default=0)
+    available_donations = db.Column(db.Integer, nullable=False, default=0)
+    available_quantity = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class RollupExpiry(db.Model):
+    # available donations per expiry date, for "expiring soon" counts
+    name_key = db.Column(db.String(200), primary_key=True)
+    region = db.Column(db.String(120), primary_key=True, default="")
+    expiry_date = db.Column(db.Date, primary_key=True, index=True)
+    donations = db.Column(db.Integer, nullable=False, default=0)
+
+
+class RollupMatchTime(db.Model):
+    # matches per whole day waited (request created -> match created), for medians
+    name_key = db.Column(db.String(200), primary_key=True)
+    region = db.Column(db.String(120), primary_key=True, default="")
+    days = db.Column(db.Integer, primary_key=True)
+    matches = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Feed of match status changes per user, written and polled by app.events
+class MatchEvent(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    match_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(30), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    # AUTOINCREMENT: ids are client cursors, so they must only ever grow
+    __table_args__ = (db.Index('ix_match_event_user_id', 'user_id', 'id'),
+                      {'sqlite_autoincrement': True})
+
+
+# Per-user dashboard read model, maintained by app.summaries
+class UserSummary(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    # listings by status (live and archived)
+    listings_available = db.Column(db.Integer, nullable=False, default=0)
+    listings_pending = db.Column(db.Integer, nullable=False, default=0)
+    listings_matched = db.Column(db.Integer, nullable=False, default=0)
+    # matches (as donor or requester) by status
+    matches_pending = db.Column(db.Integer, nullable=False, default=0)
+    matches_donor_accepted = db.Column(db.Integer, nullable=False, default=0)
+    matches_awaiting_verification = db.Column(db.Integer, nullable=False, default=0)
+    matches_completed = db.Column(db.Integer, nullable=False, default=0)
+    # matches waiting on this user, and the oldest of them
+    actions_required = db.Column(db.Integer, nullable=False, default=0)
+    next_action = db.Column(db.String(30), nullable=True)  # accept_match, confirm_match
+    next_action_match_id = db.Column(db.Integer, nullable=True)
+    latest_match_id = db.Column(db.Integer, nullable=True)
+    latest_match_status = db.Column(db.String(30), nullable=True)
+    latest_match_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,179 @@
+"""Supply/demand rollups per medicine name and region.
+
+The rollup tables are updated with small deltas from the listing and match
+write paths (in the same transaction), so the supply dashboard never has to
+scan the medicine table. Every path keys on the stored `Medicine.name_key`
+(never a fresh `drugnames.normalize()`), so a changed synonym list cannot
+send a decrement to a different key than its increment; listings without a
+name key (not yet backfilled) are left out. `rebuild()` recomputes
+everything from scratch and is exposed as the `rollup_rebuild` CLI command
+for reconciliation.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import and_, delete, exists, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from . import db
+from .models import (Medicine, Match, ArchivedMedicine, ArchivedMatch, MedicineRollup,
+                     RollupExpiry, RollupMatchTime)
+
+EXPIRING_SOON_DAYS = 30
+
+
+def region_key(location):
+    # free-form location: use the first part ("Bengaluru, KA" -> "bengaluru")
+    if not location:
+        return ""
+    return " ".join(location.split(",")[0].lower().split())
+
+
+def snapshot(med):
+    """Copy the fields the rollups depend on, taken before an edit."""
+    return SimpleNamespace(name_key=med.name_key, location=med.location, type=med.type,
+                           status=med.status, quantity=med.quantity,
+                           expiry_date=med.expiry_date)
+
+
+def _bump(model, key, **deltas):
+    # atomic upsert: insert the row or add the deltas to the existing one
+    stmt = sqlite_insert(model).values(**key, **deltas)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(key),
+        set_={col: getattr(model, col) + d for col, d in deltas.items()})
+    db.session.execute(stmt)
+
+
+def _prune(key):
+    # drop rows a negative delta emptied, so the tables match what rebuild() writes;
+    # a key with time-to-match history keeps its rollup row
+    db.session.execute(delete(RollupExpiry).where(
+        RollupExpiry.name_key == key["name_key"], RollupExpiry.region == key["region"],
+        RollupExpiry.donations <= 0))
+    has_history = exists().where(and_(RollupMatchTime.name_key == MedicineRollup.name_key,
+                                      RollupMatchTime.region == MedicineRollup.region))
+    db.session.execute(delete(MedicineRollup).where(
+        MedicineRollup.name_key == key["name_key"], MedicineRollup.region == key["region"],
+        MedicineRollup.open_requests == 0, MedicineRollup.available_donations == 0,
+        MedicineRollup.available_quantity == 0, ~has_history))
+
+
+def _apply(med, sign):
+    if med is None or med.status != "available" or not med.name_key:
+        return
+    key = dict(name_key=med.name_key, region=region_key(med.location))
+    if med.type == "request":
+        _bump(MedicineRollup, key, open_requests=sign)
+    elif med.type == "donation":
+        _bump(MedicineRollup, key, available_donations=sign,
+              available_quantity=sign * (med.quantity or 0))
+        if med.expiry_date:
+            _bump(RollupExpiry, dict(key, expiry_date=med.expiry_date), donations=sign)
+    if sign < 0:
+        _prune(key)
+
+
+def listing_changed(before, med):
+    """Move a listing's contribution from its `before` snapshot to its current state."""
+    _apply(before, -1)
+    _apply(med, +1)
+
+
+def listing_added(med):
+    listing_changed(None, med)
+
+
+def listing_removed(med):
+    _apply(med, -1)
+
+
+def match_created(match, req_med):
+    if not req_med.name_key:
+        return
+    created = match.created_at or datetime.utcnow()
+    days = max(0, (created - req_med.created_at).days) if req_med.created_at else 0
+    key = dict(name_key=req_med.name_key, region=region_key(req_med.location))
+    _bump(MedicineRollup, key, open_requests=0)
+    _bump(RollupMatchTime, dict(key, days=days), matches=1)
+
+
+def rebuild():
+    """Recompute all rollups from the medicine and match tables."""
+    rollup = defaultdict(lambda: dict(open_requests=0, available_donations=0, available_quantity=0))
+    expiry = defaultdict(int)
+    times = defaultdict(int)
+    for med in Medicine.query.yield_per(1000):
+        if med.status != "available" or not med.name_key:
+            continue
+        key = (med.name_key, region_key(med.location))
+        row = rollup[key]
+        if med.type == "request":
+            row["open_requests"] += 1
+        elif med.type == "donation":
+            row["available_donations"] += 1
+            row["available_quantity"] += med.quantity or 0
+            if med.expiry_date:
+                expiry[key + (med.expiry_date,)] += 1
+    # time-to-match history includes archived matches
+    live = (db.session.query(Match.created_at, Medicine.name_key, Medicine.location, Medicine.created_at)
+            .join(Medicine, Match.requester_medicine_id == Medicine.id))
+    cold = (db.session.query(ArchivedMatch.created_at, ArchivedMedicine.name_key, ArchivedMedicine.location,
+                             ArchivedMedicine.created_at)
+            .join(ArchivedMedicine, ArchivedMatch.requester_medicine_id == ArchivedMedicine.id))
+    for created, name_key, location, requested in live.union_all(cold).yield_per(1000):
+        if not name_key:
+            continue
+        key = (name_key, region_key(location))
+        rollup[key]  # make sure the key has a rollup row
+        days = max(0, (created - requested).days) if created and requested else 0
+        times[key + (days,)] += 1
+
+    RollupMatchTime.query.delete()
+    RollupExpiry.query.delete()
+    MedicineRollup.query.delete()
+    db.session.bulk_insert_mappings(MedicineRollup, [
+        dict(name_key=k[0], region=k[1], **v) for k, v in rollup.items()])
+    db.session.bulk_insert_mappings(RollupExpiry, [
+        dict(name_key=k[0], region=k[1], expiry_date=k[2], donations=v) for k, v in expiry.items()])
+    db.session.bulk_insert_mappings(RollupMatchTime, [
+        dict(name_key=k[0], region=k[1], days=k[2], matches=v) for k, v in times.items()])
+    db.session.commit()
+    return len(rollup)
+
+
+def _median(hist):
+    # hist: list of (days, count) sorted by days
+    total = sum(c for _, c in hist)
+    seen = 0
+    for days, count in hist:
+        seen += count
+        if seen * 2 >= total:
+            return days
+    return None
+
+
+def dashboard(today=None):
+    """Rows for the supply dashboard, most short-supplied first."""
+    today = today or date.today()
+    soon = dict(
+        ((n, r), s) for n, r, s in db.session.query(
+            RollupExpiry.name_key, RollupExpiry.region, func.sum(RollupExpiry.donations))
+        .filter(RollupExpiry.expiry_date.between(today, today + timedelta(days=EXPIRING_SOON_DAYS)))
+        .group_by(RollupExpiry.name_key, RollupExpiry.region))
+    hists = defaultdict(list)
+    for t in RollupMatchTime.query.order_by(RollupMatchTime.days):
+        if t.matches > 0:
+            hists[(t.name_key, t.region)].append((t.days, t.matches))
+    rows = []
+    for r in MedicineRollup.query.all():
+        key = (r.name_key, r.region)
+        rows.append(dict(name_key=r.name_key, region=r.region,
+                         open_requests=r.open_requests,
+                         available_donations=r.available_donations,
+                         available_quantity=r.available_quantity,
+                         expiring_soon=soon.get(key, 0) or 0,
+                         median_days_to_match=_median(hists[key]) if key in hists else None))
+    rows.sort(key=lambda x: (x["available_donations"] - x["open_requests"], x["name_key"]))
+    return rows
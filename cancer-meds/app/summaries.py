@@ -0,0 +1,104 @@
+"""Per-user dashboard summaries.
+
+`UserSummary` holds everything the donor/requester dashboards show: listing
+and match counts by status, the action waiting on the user and their latest
+match. Write paths call `refresh()` for every user whose listings or matches
+they touched, before committing, so the summary changes in the same
+transaction as the data. Dashboards then read one row by primary key.
+
+`check()` (the `summary_check` CLI command) recomputes every summary and
+reports, or with repair=True fixes, any drift.
+"""
+from sqlalchemy import func, or_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from . import db
+from .models import (Medicine, Match, ArchivedMedicine, ArchivedMatch, User,
+                     UserSummary)
+
+LISTING_STATUSES = ("available", "pending", "matched")
+MATCH_STATUSES = ("pending", "donor_accepted", "awaiting_verification", "completed")
+# match status -> (side that must act, action code)
+ACTIONS = {"pending": ("donor_id", "accept_match"),
+           "donor_accepted": ("requester_id", "confirm_match")}
+FIELDS = [c.name for c in UserSummary.__table__.columns if c.name not in ("user_id", "updated_at")]
+
+
+def compute(user_id):
+    """Build the summary values for one user from the live and archived tables."""
+    values = dict.fromkeys(FIELDS)
+    for status in LISTING_STATUSES:
+        values[f"listings_{status}"] = 0
+    for status in MATCH_STATUSES:
+        values[f"matches_{status}"] = 0
+    values["actions_required"] = 0
+
+    for model in (Medicine, ArchivedMedicine):
+        for status, n in (db.session.query(model.status, func.count())
+                          .filter(model.user_id == user_id).group_by(model.status)):
+            if status in LISTING_STATUSES:
+                values[f"listings_{status}"] += n
+
+    latest = None
+    for model in (Match, ArchivedMatch):
+        mine = or_(model.donor_id == user_id, model.requester_id == user_id)
+        for status, n in db.session.query(model.status, func.count()).filter(mine).group_by(model.status):
+            if status in MATCH_STATUSES:
+                values[f"matches_{status}"] += n
+        row = (db.session.query(model.id, model.status, model.created_at).filter(mine)
+               .order_by(model.created_at.desc(), model.id.desc()).first())
+        if row and (latest is None or (row.created_at, row.id) > (latest.created_at, latest.id)):
+            latest = row
+    if latest:
+        values.update(latest_match_id=latest.id, latest_match_status=latest.status,
+                      latest_match_at=latest.created_at)
+
+    # archived matches are always completed, so only live ones can need action
+    for status, (side, action) in ACTIONS.items():
+        waiting = Match.query.filter(getattr(Match, side) == user_id, Match.status == status)
+        n = waiting.count()
+        if n:
+            values["actions_required"] += n
+            if values["next_action"] is None:
+                oldest = waiting.order_by(Match.created_at, Match.id).first()
+                values.update(next_action=action, next_action_match_id=oldest.id)
+    return values
+
+
+def refresh(*user_ids):
+    """Recompute and upsert the summaries of `user_ids` (call before commit)."""
+    for user_id in set(filter(None, user_ids)):
+        values = compute(user_id)
+        stmt = sqlite_insert(UserSummary).values(user_id=user_id, **values)
+        stmt = stmt.on_conflict_do_update(index_elements=["user_id"],
+                                          set_=dict(values, updated_at=func.current_timestamp()))
+        db.session.execute(stmt)
+
+
+def get(user_id):
+    """The user's summary, built on first access."""
+    summary = db.session.get(UserSummary, user_id)
+    if summary is None:
+        refresh(user_id)
+        db.session.commit()
+        summary = db.session.get(UserSummary, user_id)
+    return summary
+
+
+def check(repair=False):
+    """Compare every stored summary with a fresh computation.
+
+    Returns the ids of users whose summary had drifted (or was missing);
+    with repair=True those summaries are rewritten.
+    """
+    stored = {s.user_id: s for s in UserSummary.query.all()}
+    drifted = []
+    for (user_id,) in db.session.query(User.id).filter(User.role.in_(("donor", "requester"))):
+        values = compute(user_id)
+        s = stored.get(user_id)
+        if s is None or any(getattr(s, k) != v for k, v in values.items()):
+            drifted.append(user_id)
+    if repair and drifted:
+        refresh(*drifted)
+        db.session.commit()
+    return drifted
@@ -1,5 +1,6 @@
 # run.py - small CLI to run & init DB
 import os
+import click
 from app import create_app, db
 from app.models import User, Medicine, Match
 
@@ -10,6 +11,60 @@ def db_create():
     db.create_all()
     print("Database created (SQLite).")
 
+@app.cli.command("rollup_rebuild")
+def rollup_rebuild():
+    from app import rollups
+    keys = rollups.rebuild()
+    print(f"Supply/demand rollups rebuilt ({keys} medicine/region keys).")
+
+@app.cli.command("name_key_backfill")
+def name_key_backfill():
+    from app import drugnames, rollups
+    from app.models import ArchivedMedicine
+    changed = 0
+    # archived listings too: the rollups' time-to-match history reads them
+    for model in (Medicine, ArchivedMedicine):
+        last_id = 0
+        # walk the table in id-ordered batches so memory stays flat
+        while True:
+            batch = model.query.filter(model.id > last_id).order_by(model.id).limit(500).all()
+            if not batch:
+                break
+            for m in batch:
+                key = drugnames.normalize(m.name)
+                if m.name_key != key:
+                    m.name_key = key
+                    changed += 1
+                # live listings also carry their normalized region
+                if model is Medicine and m.region != rollups.region_key(m.location):
+                    m.region = rollups.region_key(m.location)
+            last_id = batch[-1].id
+            db.session.commit()
+    print(f"Medicine name keys updated: {changed}")
+    if changed:
+        # rollups are keyed on name_key, so they have to follow the new keys
+        keys = rollups.rebuild()
+        print(f"Supply/demand rollups rebuilt ({keys} medicine/region keys).")
+
+@app.cli.command("archive_history")
+@click.option("--days", default=90, show_default=True, help="Archive history older than this many days")
+@click.option("--batch-size", default=500, show_default=True)
+@click.option("--pause", default=0.1, show_default=True, help="Seconds to sleep between batches")
+def archive_history(days, batch_size, pause):
+    from app import archive
+    moved = archive.run(older_than_days=days, batch_size=batch_size, pause=pause)
+    print(f"Archived {moved['matches']} matches, {moved['medicines']} listings, {moved['images']} images.")
+
+@app.cli.command("summary_check")
+@click.option("--repair", is_flag=True, help="Rewrite summaries that have drifted")
+def summary_check(repair):
+    from app import summaries
+    drifted = summaries.check(repair=repair)
+    if not drifted:
+        print("All user summaries are consistent.")
+    else:
+        print(f"{'Repaired' if repair else 'Drifted'} summaries for {len(drifted)} users: {drifted}")
+
 @app.cli.command("runserver")
 def runserver():
     app.run(debug=True, host="127.0.0.1", port=5000)
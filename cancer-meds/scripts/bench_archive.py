@@ -0,0 +1,110 @@
+"""Benchmark live queries with history kept hot vs archived.
+
+Builds a throwaway SQLite database with a small live working set plus a
+growing amount of completed history, then times the queries every page
+load runs (homepage donations, doctor pending count, donation search and a
+donor's open listings) before and after `archive.run()` moves the history out.
+
+Usage:
+  python scripts/bench_archive.py [--history 1000 10000 50000] [--repeat 50]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+LIVE_DONATIONS = 200
+NAMES = ['imatinib', 'nilotinib', 'capecitabine', 'temozolomide', 'letrozole',
+         'tamoxifen', 'paracetamol', 'ondansetron', 'lenalidomide', 'bortezomib']
+
+
+def seed(db, history):
+    from app.models import User, Medicine, Match
+    db.session.add_all([
+        User(id=1, name='donor', email='donor@example.org', password_hash='x', role='donor'),
+        User(id=2, name='requester', email='requester@example.org', password_hash='x', role='requester'),
+    ])
+    old = datetime.utcnow() - timedelta(days=365)
+    meds, matches = [], []
+    for i in range(history):
+        name = NAMES[i % len(NAMES)]
+        did, rid = 2 * i + 1, 2 * i + 2
+        meds.append(dict(id=did, user_id=1, name=name, name_key=name, quantity=10, type='donation',
+                         status='matched', created_at=old))
+        meds.append(dict(id=rid, user_id=2, name=name, name_key=name, quantity=10, type='request',
+                         status='matched', created_at=old))
+        matches.append(dict(id=i + 1, donor_id=1, requester_id=2, donor_medicine_id=did,
+                            requester_medicine_id=rid, status='completed', created_at=old))
+    base = 2 * history
+    for i in range(LIVE_DONATIONS):
+        name = NAMES[i % len(NAMES)]
+        meds.append(dict(id=base + i + 1, user_id=1, name=name, name_key=name, quantity=5,
+                         type='donation', status='available', created_at=datetime.utcnow()))
+    db.session.bulk_insert_mappings(Medicine, meds)
+    db.session.bulk_insert_mappings(Match, matches)
+    db.session.commit()
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def live_queries(db):
+    from app.models import Medicine, Match
+    return {
+        'homepage donations': lambda: Medicine.query.filter_by(type='donation', status='available').limit(8).all(),
+        'pending count': lambda: Match.query.filter_by(status='awaiting_verification').count(),
+        'search by name': lambda: Medicine.query.filter_by(name_key='imatinib', type='donation', status='available').all(),
+        'open donations': lambda: Medicine.query.filter_by(user_id=1, type='donation', status='available').all(),
+    }
+
+
+def bench(app, history, repeat):
+    from app import db, archive
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        seed(db, history)
+        queries = live_queries(db)
+        hot = {k: timed(q, repeat) for k, q in queries.items()}
+        moved = archive.run(older_than_days=30, batch_size=5000, pause=0)
+        cold = {k: timed(q, repeat) for k, q in queries.items()}
+        db.session.remove()
+    print(f"\nhistory={history} completed matches (archived {moved['matches']} matches, {moved['medicines']} listings)")
+    print(f"  {'query':<20} {'hot ms':>10} {'archived ms':>12}")
+    for k in hot:
+        print(f"  {k:<20} {hot[k]:>10.3f} {cold[k]:>12.3f}")
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--history', type=int, nargs='+', default=[1000, 10000, 50000])
+    p.add_argument('--repeat', type=int, default=50)
+    args = p.parse_args()
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    # must be set before the app (and its Config) is imported
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+    from app import create_app, db
+    app = create_app()
+    try:
+        for n in args.history:
+            bench(app, n, args.repeat)
+    finally:
+        with app.app_context():
+            db.engine.dispose()
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Regression check: archiving must never collide with ids handed out later.
+
+Builds a throwaway SQLite database, archives some old completed matches,
+creates new listings and matches (letting SQLite pick the ids, as the app
+does), archives again and checks that no id was reused: the second run must
+not fail on archived_*.id and every match id must resolve to one row.
+
+Usage:
+  python scripts/check_archive_ids.py [--rounds 3] [--per-round 5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def add_completed(db, n, created_at):
+    # ids are left to the database on purpose
+    from app.models import Image, Match, Medicine
+    matches = []
+    for _ in range(n):
+        don = Medicine(user_id=1, name='imatinib', name_key='imatinib', quantity=10,
+                       type='donation', status='matched', created_at=created_at)
+        req = Medicine(user_id=2, name='imatinib', name_key='imatinib', quantity=10,
+                       type='request', status='matched', created_at=created_at)
+        db.session.add_all([don, req])
+        db.session.flush()
+        db.session.add(Image(filename='proof.jpg', medicine_id=req.id, uploader_id=2,
+                             image_type='prescription', created_at=created_at))
+        m = Match(donor_id=1, requester_id=2, donor_medicine_id=don.id,
+                  requester_medicine_id=req.id, status='completed', created_at=created_at)
+        db.session.add(m)
+        matches.append(m)
+    db.session.commit()
+    return [m.id for m in matches]
+
+
+def check(app, rounds, per_round):
+    from app import db, archive
+    from app.models import (User, Match, Medicine, Image, ArchivedMatch, ArchivedMedicine,
+                            ArchivedImage)
+    old = datetime.utcnow() - timedelta(days=365)
+    problems = []
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            User(id=1, name='donor', email='donor@example.org', password_hash='x', role='donor'),
+            User(id=2, name='requester', email='requester@example.org', password_hash='x', role='requester'),
+        ])
+        db.session.commit()
+        seen = set()
+        for i in range(rounds):
+            ids = add_completed(db, per_round, old)
+            reused = seen.intersection(ids)
+            if reused:
+                problems.append(f"round {i + 1}: match ids {sorted(reused)} were already archived")
+            seen.update(ids)
+            try:
+                moved = archive.run(older_than_days=30, batch_size=per_round, pause=0)
+            except Exception as e:
+                problems.append(f"round {i + 1}: archive.run failed: {e}")
+                db.session.rollback()
+                break
+            print(f"round {i + 1}: new match ids {ids[0]}..{ids[-1]}, archived {moved}")
+        # a live row and an archived row must never share an id
+        for live, cold in ((Match, ArchivedMatch), (Medicine, ArchivedMedicine), (Image, ArchivedImage)):
+            both = (db.session.query(live.id).filter(live.id.in_(db.session.query(cold.id))).all())
+            if both:
+                problems.append(f"{live.__tablename__} ids also archived: {[r[0] for r in both]}")
+        for match_id in seen:
+            m = archive.get_match(match_id)
+            if m is None or not m.archived:
+                problems.append(f"match {match_id} does not resolve to its archived row")
+        db.session.remove()
+        db.engine.dispose()
+    return problems
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--rounds', type=int, default=3)
+    p.add_argument('--per-round', type=int, default=5)
+    args = p.parse_args()
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    # must be set before the app (and its Config) is imported
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+    from app import create_app
+    app = create_app()
+    try:
+        problems = check(app, args.rounds, args.per_round)
+    finally:
+        os.remove(path)
+    for msg in problems:
+        print("FAIL:", msg)
+    if problems:
+        sys.exit(1)
+    print("OK: no archived id was reused.")
+
+
+if __name__ == '__main__':
+    main()
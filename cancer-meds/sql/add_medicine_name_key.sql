@@ -0,0 +1,7 @@
+-- Add the canonical drug-name match key to the medicine table
+ALTER TABLE medicine ADD COLUMN name_key VARCHAR(200);
+CREATE INDEX IF NOT EXISTS ix_medicine_match_key ON medicine(name_key, type, status);
+
+-- Then fill it for existing rows (and rebuild the supply rollups, which key on it):
+--   flask --app run name_key_backfill
+--   flask --app run rollup_rebuild
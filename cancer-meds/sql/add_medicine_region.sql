@@ -0,0 +1,8 @@
+-- Store the normalized region on the medicine table and add it to the match-key index,
+-- so standing-request lookups are one (name_key, type, status, region) index scan
+ALTER TABLE medicine ADD COLUMN region VARCHAR(300) DEFAULT '';
+DROP INDEX IF EXISTS ix_medicine_match_key;
+CREATE INDEX IF NOT EXISTS ix_medicine_match_key ON medicine(name_key, type, status, region);
+
+-- Then fill it for existing rows (together with the name keys):
+--   flask --app run name_key_backfill
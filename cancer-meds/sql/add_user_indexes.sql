@@ -0,0 +1,7 @@
+-- Per-user lookup indexes (used by the listing pages and the dashboard summaries)
+CREATE INDEX IF NOT EXISTS ix_medicine_user_id ON medicine(user_id);
+CREATE INDEX IF NOT EXISTS ix_match_donor_id ON "match"(donor_id);
+CREATE INDEX IF NOT EXISTS ix_match_requester_id ON "match"(requester_id);
+
+-- New tables (user_summary etc.) are created by: flask --app run db_create
+-- Then fill the summaries: flask --app run summary_check --repair
@@ -0,0 +1,95 @@
+-- Make medicine, match and image ids AUTOINCREMENT so SQLite never reuses them.
+-- Archived rows keep their ids (see app/archive.py); without AUTOINCREMENT a new
+-- listing or match can get the id of an archived one, and the next archive run
+-- fails with "UNIQUE constraint failed: archived_match.id".
+-- WARNING: Always back up your database before running schema-changing SQL.
+-- Steps:
+-- 1) Make a copy of your DB file first (outside SQLite):
+--    copy site.db site.db.bak
+-- 2) Run sql/add_medicine_name_key.sql, sql/add_medicine_region.sql and
+--    `flask --app run db_create` first, so the name_key and region columns and the
+--    archived_* tables exist.
+-- 3) Run this script in DB Browser -> Execute SQL (or sqlite3 CLI). It recreates the
+--    three tables with AUTOINCREMENT, copies existing data and starts each id sequence
+--    after the highest id in both the live and the archived table.
+--    Like remove_medicine_latlon.sql, it leaves out medicine.latitude/longitude.
+
+PRAGMA foreign_keys = OFF;
+BEGIN TRANSACTION;
+
+CREATE TABLE medicine_new (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    name VARCHAR(200) NOT NULL,
+    quantity INTEGER NOT NULL,
+    expiry_date DATE,
+    type VARCHAR(20) NOT NULL,
+    status VARCHAR(20),
+    created_at DATETIME,
+    proof VARCHAR(300),
+    location VARCHAR(300),
+    name_key VARCHAR(200),
+    region VARCHAR(300) DEFAULT '',
+    FOREIGN KEY(user_id) REFERENCES "user"(id)
+);
+INSERT INTO medicine_new (id, user_id, name, quantity, expiry_date, type, status, created_at, proof, location, name_key, region)
+SELECT id, user_id, name, quantity, expiry_date, type, status, created_at, proof, location, name_key, region FROM medicine;
+DROP TABLE medicine;
+ALTER TABLE medicine_new RENAME TO medicine;
+CREATE INDEX ix_medicine_user_id ON medicine(user_id);
+CREATE INDEX ix_medicine_match_key ON medicine(name_key, type, status, region);
+
+CREATE TABLE match_new (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    donor_id INTEGER NOT NULL,
+    requester_id INTEGER NOT NULL,
+    donor_medicine_id INTEGER NOT NULL,
+    requester_medicine_id INTEGER NOT NULL,
+    status VARCHAR(20),
+    created_at DATETIME,
+    FOREIGN KEY(donor_id) REFERENCES "user"(id),
+    FOREIGN KEY(requester_id) REFERENCES "user"(id),
+    FOREIGN KEY(donor_medicine_id) REFERENCES medicine(id),
+    FOREIGN KEY(requester_medicine_id) REFERENCES medicine(id)
+);
+INSERT INTO match_new (id, donor_id, requester_id, donor_medicine_id, requester_medicine_id, status, created_at)
+SELECT id, donor_id, requester_id, donor_medicine_id, requester_medicine_id, status, created_at FROM "match";
+DROP TABLE "match";
+ALTER TABLE match_new RENAME TO "match";
+CREATE INDEX ix_match_donor_id ON "match"(donor_id);
+CREATE INDEX ix_match_requester_id ON "match"(requester_id);
+
+CREATE TABLE image_new (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    filename TEXT NOT NULL,
+    medicine_id INTEGER NOT NULL,
+    uploader_id INTEGER NOT NULL,
+    image_type TEXT NOT NULL,
+    approved INTEGER DEFAULT 0,
+    approved_by INTEGER,
+    approved_at TEXT,
+    created_at TEXT DEFAULT (datetime('now')),
+    FOREIGN KEY (medicine_id) REFERENCES medicine(id),
+    FOREIGN KEY (uploader_id) REFERENCES "user"(id),
+    FOREIGN KEY (approved_by) REFERENCES "user"(id)
+);
+INSERT INTO image_new (id, filename, medicine_id, uploader_id, image_type, approved, approved_by, approved_at, created_at)
+SELECT id, filename, medicine_id, uploader_id, image_type, approved, approved_by, approved_at, created_at FROM image;
+DROP TABLE image;
+ALTER TABLE image_new RENAME TO image;
+CREATE INDEX idx_image_medicine_id ON image(medicine_id);
+CREATE INDEX idx_image_uploader_id ON image(uploader_id);
+CREATE INDEX idx_image_approved ON image(approved);
+
+-- Start each sequence past every id already used, live or archived
+DELETE FROM sqlite_sequence WHERE name IN ('medicine', 'match', 'image');
+INSERT INTO sqlite_sequence (name, seq) VALUES
+    ('medicine', MAX(IFNULL((SELECT MAX(id) FROM medicine), 0), IFNULL((SELECT MAX(id) FROM archived_medicine), 0))),
+    ('match', MAX(IFNULL((SELECT MAX(id) FROM "match"), 0), IFNULL((SELECT MAX(id) FROM archived_match), 0))),
+    ('image', MAX(IFNULL((SELECT MAX(id) FROM image), 0), IFNULL((SELECT MAX(id) FROM archived_image), 0)));
+
+COMMIT;
+PRAGMA foreign_keys = ON;
+
+-- After running, check the sequences:
+-- SELECT * FROM sqlite_sequence;